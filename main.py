@@ -3,16 +3,12 @@
 import os
 import sys
 import argparse
+from src.log import configure_logging
 from src.monitor import Monitor
 
-def setup_logging():
-    """Create logs directory if it doesn't exist."""
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-
 def main():
-    # Create logs directory
-    setup_logging()
+    # Configure logging once for the whole process
+    configure_logging()
 
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Google Maps Review Manager')
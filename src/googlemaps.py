@@ -1,16 +1,15 @@
 # -*- coding: utf-8 -*-
-import itertools
-import logging
 import re
 import time
 import traceback
+from collections import deque
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver import ChromeOptions as Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.action_chains import ActionChains
@@ -20,17 +19,32 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+from .governor import BlockedError, Governor, NavigationError, is_block_page
+from .log import get_logger
+
 GM_WEBPAGE = 'https://www.google.com/maps/'
 MAX_WAIT = 5
 MAX_RETRY = 3
 MAX_SCROLLS = 20
+MAX_SCROLL_STALLS = 5  # scrolls without growth before giving up on loading reviews past offset
+
+# adaptive search grid: cells start coarse and are split in four while their results list is saturated
+MIN_ZOOM = 12
+MAX_ZOOM = 17
+ZOOM_SPAN = 0.03  # degrees covered by a cell at zoom 15, halved at each extra zoom level
+SATURATED_RESULTS = 100
+
+# shared by every scraper in the process so pacing and backoff apply globally
+GOVERNOR = Governor(max_retry=MAX_RETRY)
 
 class GoogleMapsScraper:
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, governor=None, base_url=GM_WEBPAGE, driver=None):
         self.debug = debug
-        self.driver = self.__get_driver()
-        self.logger = self.__get_logger()
+        self.governor = GOVERNOR if governor is None else governor
+        self.base_url = base_url
+        self.driver = self.__get_driver() if driver is None else driver
+        self.logger = get_logger('googlemaps-scraper')
         self.wait = WebDriverWait(self.driver, MAX_WAIT)
 
     def __enter__(self):
@@ -46,83 +60,128 @@ class GoogleMapsScraper:
         return True
 
     def sort_by(self, url, ind):
-        self.driver.get(url)
-        self.__click_on_cookie_agreement()
-
         try:
-            menu_bt = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button[data-value="Sort"]')))
-            menu_bt.click()
-            
-            menu_items = self.wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div[role="menuitemradio"]')))
-            if ind < len(menu_items):
-                menu_items[ind].click()
-                self.wait.until(EC.staleness_of(menu_bt))
-                return 0
+            return self.governor.run(self.__sort_by, url, ind)
         except Exception as e:
-            self.logger.warn(f'Failed to click sorting button: {str(e)}')
+            self.logger.warning(f'Failed to click sorting button: {str(e)}')
             return -1
 
-    def get_places(self, keyword_list=None):
-        df_places = pd.DataFrame()
-        search_point_url_list = self._gen_search_points_from_square(keyword_list=keyword_list)
+    def __sort_by(self, url, ind):
+        self.__navigate(url)
+        self.__click_on_cookie_agreement()
 
-        for i, search_point_url in enumerate(search_point_url_list):
-            print(f"Processing {i+1}/{len(search_point_url_list)}: {search_point_url}")
+        menu_bt = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button[data-value="Sort"]')))
+        menu_bt.click()
 
-            if (i+1) % 10 == 0:
-                print(f"Saving progress: {i}/{len(search_point_url_list)}")
-                df_places = df_places[['search_point_url', 'href', 'name', 'rating', 'num_reviews', 'close_time', 'other']]
-                df_places.to_csv('output/places_wax.csv', index=False)
+        menu_items = self.wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div[role="menuitemradio"]')))
+        if ind < len(menu_items):
+            menu_items[ind].click()
+            self.wait.until(EC.staleness_of(menu_bt))
+            return 0
 
-            try:
-                self.driver.get(search_point_url)
-                results_container = self.wait.until(EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "div.m6QErb.DxyBCb.kA9KIf.dS8AEf.ecceSd > div[aria-label*='Results for']")
-                ))
-                
-                last_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
-                scrolls = 0
-                while scrolls < MAX_SCROLLS:
-                    self.driver.execute_script('arguments[0].scrollTop = arguments[0].scrollHeight', results_container)
-                    time.sleep(0.5)
-                    new_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
-                    if new_height == last_height:
-                        break
-                    last_height = new_height
-                    scrolls += 1
-
-                response = BeautifulSoup(self.driver.page_source, 'html.parser')
-                div_places = response.select('div[jsaction] > a[href]')
-
-                for div_place in div_places:
-                    place_info = {
-                        'search_point_url': search_point_url.replace('https://www.google.com/maps/search/', ''),
-                        'href': div_place['href'],
-                        'name': div_place['aria-label']
-                    }
-                    df_places = df_places.append(place_info, ignore_index=True)
+    def get_places(self, keyword_list=None):
+        places = []
+        known_hrefs = set()
+        cells = deque(self._gen_search_cells(keyword_list=keyword_list))
+        failed_cells = set()
+
+        n_loads = 0
+        while cells:
+            keyword, lat, lng, zoom = cells.popleft()
+            search_point_url = self._search_point_url(keyword, lat, lng, zoom)
+            n_loads += 1
+            self.logger.info(f"Processing {n_loads} ({len(cells)} queued): {search_point_url}")
+
+            if n_loads % 10 == 0:
+                self.logger.info(f"Saving progress: {len(places)} places")
+                self.__save_places(places)
 
+            try:
+                place_list, saturated = self.governor.run(self._scrape_search_point, search_point_url)
             except Exception as e:
                 self.logger.error(f"Error processing {search_point_url}: {str(e)}")
+                # a coarse cell covers a large area, so give it a second chance at the end of the queue
+                cell = (keyword, lat, lng, zoom)
+                if cell not in failed_cells:
+                    failed_cells.add(cell)
+                    cells.append(cell)
                 continue
 
-        df_places = df_places[['search_point_url', 'href', 'name']]
+            new_places = [p for p in place_list if (keyword, p['href']) not in known_hrefs]
+            known_hrefs.update((keyword, p['href']) for p in new_places)
+            places += new_places
+
+            # only dense cells that still yield unseen places are worth zooming into
+            if saturated and new_places and zoom < MAX_ZOOM:
+                cells.extend(self._split_cell(keyword, lat, lng, zoom))
+
+        self.__save_places(places)
+
+    def _scrape_search_point(self, search_point_url):
+        self.__navigate(search_point_url)
+        try:
+            results_container = self.wait.until(EC.presence_of_element_located(
+                (By.CSS_SELECTOR, "div.m6QErb.DxyBCb.kA9KIf.dS8AEf.ecceSd > div[aria-label*='Results for']")
+            ))
+        except TimeoutException:
+            # cells with zero or one result have no results list, which is an answer, not a failure
+            self.__check_blocked()
+            return [], False
+
+        last_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
+        scrolls = 0
+        while scrolls < MAX_SCROLLS:
+            self.governor.acquire()
+            self.driver.execute_script('arguments[0].scrollTop = arguments[0].scrollHeight', results_container)
+            time.sleep(0.5)
+            new_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
+            if new_height == last_height:
+                break
+            last_height = new_height
+            scrolls += 1
+
+        response = BeautifulSoup(self.driver.page_source, 'html.parser')
+        div_places = response.select('div[jsaction] > a[href]')
+
+        place_list = [{
+            'search_point_url': search_point_url.replace(self.base_url + 'search/', ''),
+            'href': div_place['href'],
+            'name': div_place['aria-label']
+        } for div_place in div_places]
+
+        saturated = scrolls == MAX_SCROLLS or len(place_list) >= SATURATED_RESULTS
+
+        return place_list, saturated
+
+    def __save_places(self, places):
+        df_places = pd.DataFrame(places, columns=['search_point_url', 'href', 'name'])
         df_places.to_csv('output/places_wax.csv', index=False)
 
     def get_reviews(self, offset):
         # Wait for reviews container
-        reviews_container = self.wait.until(EC.presence_of_element_located(
-            (By.CSS_SELECTOR, 'div.m6QErb.DxyBCb.kA9KIf.dS8AEf')
-        ))
+        try:
+            reviews_container = self.wait.until(EC.presence_of_element_located(
+                (By.CSS_SELECTOR, 'div.m6QErb.DxyBCb.kA9KIf.dS8AEf')
+            ))
+        except TimeoutException:
+            self.__check_blocked()
+            raise
         
-        # Scroll with dynamic wait
+        # Scroll with dynamic wait, and keep trying while a reloaded page has not caught up with offset
         last_height = self.driver.execute_script("return arguments[0].scrollHeight", reviews_container)
+        stalls = 0
         while True:
+            self.governor.acquire()
             self.driver.execute_script('arguments[0].scrollTop = arguments[0].scrollHeight', reviews_container)
             time.sleep(0.5)
             new_height = self.driver.execute_script("return arguments[0].scrollHeight", reviews_container)
             if new_height == last_height:
-                break
+                stalls += 1
+                if stalls >= MAX_SCROLL_STALLS or offset == 0 or \
+                        len(self.driver.find_elements(By.CSS_SELECTOR, 'div.jftiEf.fontBodyMedium')) > offset:
+                    break
+            else:
+                stalls = 0
             last_height = new_height
 
         buttons = self.driver.find_elements(By.CSS_SELECTOR, 'button.w8nwRe.kyuRq')
@@ -135,17 +194,38 @@ class GoogleMapsScraper:
 
         response = BeautifulSoup(self.driver.page_source, 'html.parser')
         rblock = response.find_all('div', class_='jftiEf fontBodyMedium')
+        if len(rblock) < offset:
+            # reviews up to offset were already seen, so the page failed to load them again
+            raise TimeoutException(f'Only {len(rblock)} of {offset} reviews loaded')
+
         parsed_reviews = []
         for index, review in enumerate(rblock):
             if index >= offset:
                 r = self.__parse(review)
                 parsed_reviews.append(r)
-                print(r)
+                self.logger.debug('review parsed', extra={'fields': r, 'sample': True})
 
         return parsed_reviews
 
+    def get_reviews_from(self, url, ind, offset):
+        """Get reviews from `offset`, reloading the sorted page and resuming there when loading fails."""
+        for attempt in range(self.governor.max_retry + 1):
+            try:
+                reviews = self.get_reviews(offset)
+            except Exception as e:
+                self.governor.record(False)
+                if attempt == self.governor.max_retry:
+                    raise
+                self.logger.warning(f'Reloading {url} at review {offset}: {str(e)}')
+                time.sleep(self.governor.backoff(attempt, blocked=isinstance(e, BlockedError)))
+                if self.sort_by(url, ind) != 0:
+                    raise
+            else:
+                self.governor.record(True)
+                return reviews
+
     def get_account(self, url):
-        self.driver.get(url)
+        self.governor.run(self.__navigate, url)
         self.__click_on_cookie_agreement()
 
         time.sleep(2)
@@ -274,26 +354,45 @@ class GoogleMapsScraper:
 
         return place
 
-    def _gen_search_points_from_square(self, keyword_list=None):
+    def _gen_search_cells(self, keyword_list=None):
         keyword_list = [] if keyword_list is None else keyword_list
 
         square_points = pd.read_csv('input/square_points.csv')
 
         cities = square_points['city'].unique()
 
-        search_urls = []
+        span = self._cell_span(MIN_ZOOM)
+        cells = []
 
         for city in cities:
 
             df_aux = square_points[square_points['city'] == city]
-            latitudes = df_aux['latitude'].unique()
-            longitudes = df_aux['longitude'].unique()
-            coordinates_list = list(itertools.product(latitudes, longitudes, keyword_list))
+            lat_min, lat_max = df_aux['latitude'].min(), df_aux['latitude'].max()
+            lng_min, lng_max = df_aux['longitude'].min(), df_aux['longitude'].max()
+
+            # cover the city bounding box with coarse cells, with the grid centered on the box
+            n_lat = max(1, int(np.ceil((lat_max - lat_min) / span)))
+            n_lng = max(1, int(np.ceil((lng_max - lng_min) / span)))
+            lat_start = lat_min - (n_lat * span - (lat_max - lat_min)) / 2
+            lng_start = lng_min - (n_lng * span - (lng_max - lng_min)) / 2
+            for keyword in keyword_list:
+                for i in range(n_lat):
+                    for j in range(n_lng):
+                        cells.append((keyword, lat_start + (i + 0.5) * span, lng_start + (j + 0.5) * span, MIN_ZOOM))
 
-            search_urls += [f"https://www.google.com/maps/search/{coordinates[2]}/@{str(coordinates[1])},{str(coordinates[0])},{str(15)}z"
-             for coordinates in coordinates_list]
+        return cells
 
-        return search_urls
+    def _split_cell(self, keyword, lat, lng, zoom):
+        offset = self._cell_span(zoom + 1) / 2
+        return [(keyword, lat + d_lat, lng + d_lng, zoom + 1)
+                for d_lat in (-offset, offset) for d_lng in (-offset, offset)]
+
+    @staticmethod
+    def _cell_span(zoom):
+        return ZOOM_SPAN * 2 ** (15 - zoom)
+
+    def _search_point_url(self, keyword, lat, lng, zoom):
+        return f"{self.base_url}search/{keyword}/@{lat:.6f},{lng:.6f},{zoom}z"
 
     def __expand_reviews(self):
         buttons = self.driver.find_elements(By.CSS_SELECTOR,'button.w8nwRe.kyuRq')
@@ -304,21 +403,6 @@ class GoogleMapsScraper:
         scrollable_div = self.driver.find_element(By.CSS_SELECTOR,'div.m6QErb.DxyBCb.kA9KIf.dS8AEf')
         self.driver.execute_script('arguments[0].scrollTop = arguments[0].scrollHeight', scrollable_div)
 
-    def __get_logger(self):
-        logger = logging.getLogger('googlemaps-scraper')
-        logger.setLevel(logging.DEBUG)
-
-        fh = logging.FileHandler('gm-scraper.log')
-        fh.setLevel(logging.DEBUG)
-
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-        fh.setFormatter(formatter)
-
-        logger.addHandler(fh)
-
-        return logger
-
     def __get_driver(self):
         options = Options()
         if not self.debug:
@@ -347,10 +431,26 @@ class GoogleMapsScraper:
         service = Service()
         input_driver = webdriver.Chrome(service=service, options=options)
         
-        input_driver.get(GM_WEBPAGE)
+        input_driver.get(self.base_url)
         
         return input_driver
 
+    def __navigate(self, url):
+        try:
+            self.driver.get(url)
+        except WebDriverException as e:
+            raise NavigationError(f'Failed to load {url}: {e.msg}') from e
+        self.__check_blocked()
+
+    def __check_blocked(self):
+        if 'consent.google.com' in self.driver.current_url:
+            self.__click_on_cookie_agreement()
+            if 'consent.google.com' in self.driver.current_url:
+                raise BlockedError(f'Consent page not dismissed: {self.driver.current_url}')
+
+        if is_block_page(self.driver.current_url, self.driver.page_source):
+            raise BlockedError(f'Block page served: {self.driver.current_url}')
+
     def __click_on_cookie_agreement(self):
         try:
             agree = self.wait.until(
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+GLOBAL_RATE = 2.0  # page loads per second across all workers
+WORKER_RATE = 1.0  # page loads per second for a single worker
+BURST = 3
+MAX_CONCURRENCY = 4
+MAX_RETRY = 3
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+BLOCK_BASE_DELAY = 30.0  # blocks need far longer to clear than transient failures
+BLOCK_MAX_DELAY = 600.0
+ERROR_WINDOW = 20
+MAX_ERROR_RATE = 0.3
+MIN_RATE_SCALE = 1 / 16
+COOLDOWN = 30.0  # pause for every worker when the error rate trips
+
+BLOCK_URL_MARKERS = ('/sorry/',)
+BLOCK_PAGE_MARKERS = ('our systems have detected unusual traffic', 'g-recaptcha')
+
+
+class BlockedError(Exception):
+    """Raised when Google serves a block, CAPTCHA or unresolved consent page."""
+
+
+class NavigationError(Exception):
+    """Raised when a page fails to load at all, e.g. a dropped connection or a page load timeout."""
+
+
+# only these mean the site or network is struggling; anything else is the page's own content
+RETRY_ERRORS = (BlockedError, NavigationError)
+
+
+def is_block_page(url, html):
+    url = (url or '').lower()
+    html = (html or '').lower()
+    return any(marker in url for marker in BLOCK_URL_MARKERS) or any(marker in html for marker in BLOCK_PAGE_MARKERS)
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.rate = rate
+
+
+class Governor:
+    """Paces, retries and throttles page loads shared by every scraper in the process.
+
+    Each governed call takes a token from a global bucket and from the calling
+    worker's own bucket, and runs inside a concurrency slot. When the error rate
+    over the last `window` calls exceeds `max_error_rate`, every worker pauses
+    for `cooldown` seconds, the number of slots is halved and all rates are
+    halved. After a clean window the slots grow back by one and the rates double.
+
+    Only `RETRY_ERRORS` are retried and counted as failures; any other exception
+    propagates straight away without touching the error window.
+    """
+
+    def __init__(self, rate=GLOBAL_RATE, worker_rate=WORKER_RATE, burst=BURST, max_concurrency=MAX_CONCURRENCY,
+                 max_retry=MAX_RETRY, base_delay=BASE_DELAY, max_delay=MAX_DELAY, block_base_delay=BLOCK_BASE_DELAY,
+                 block_max_delay=BLOCK_MAX_DELAY, window=ERROR_WINDOW, max_error_rate=MAX_ERROR_RATE,
+                 cooldown=COOLDOWN):
+        if max_retry < 0:
+            raise ValueError(f'max_retry must be >= 0, got {max_retry}')
+
+        self.rate = rate
+        self.worker_rate = worker_rate
+        self.rate_scale = 1.0
+        self.bucket = TokenBucket(rate, burst)
+        self.burst = burst
+        self.worker_buckets = {}
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.max_retry = max_retry
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.block_base_delay = block_base_delay
+        self.block_max_delay = block_max_delay
+        self.cooldown = cooldown
+        self.cooldown_until = 0.0
+        self.outcomes = deque(maxlen=window)
+        self.max_error_rate = max_error_rate
+        self.cond = threading.Condition()
+
+    def acquire(self, worker=None):
+        """Wait for the global and per-worker rate limits."""
+        worker = threading.get_ident() if worker is None else worker
+        with self.cond:
+            bucket = self.worker_buckets.get(worker)
+            if bucket is None:
+                bucket = self.worker_buckets[worker] = TokenBucket(self.worker_rate * self.rate_scale, self.burst)
+            pause = self.cooldown_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        bucket.acquire()
+        self.bucket.acquire()
+
+    @contextmanager
+    def slot(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    def record(self, ok):
+        with self.cond:
+            self.outcomes.append(ok)
+            if len(self.outcomes) < self.outcomes.maxlen:
+                return
+            error_rate = self.outcomes.count(False) / len(self.outcomes)
+            if error_rate > self.max_error_rate:
+                self.limit = max(1, self.limit // 2)
+                self.cooldown_until = time.monotonic() + self.cooldown
+                self._scale_rates(max(MIN_RATE_SCALE, self.rate_scale / 2))
+                self.outcomes.clear()
+            elif error_rate == 0 and (self.limit < self.max_concurrency or self.rate_scale < 1):
+                self.limit = min(self.max_concurrency, self.limit + 1)
+                self._scale_rates(min(1.0, self.rate_scale * 2))
+                self.outcomes.clear()
+                self.cond.notify_all()
+
+    def _scale_rates(self, scale):
+        self.rate_scale = scale
+        self.bucket.set_rate(self.rate * scale)
+        for bucket in self.worker_buckets.values():
+            bucket.set_rate(self.worker_rate * scale)
+
+    def backoff(self, attempt, blocked=False):
+        """Full-jitter exponential backoff delay for a 0-based attempt."""
+        if blocked:
+            return random.uniform(0, min(self.block_max_delay, self.block_base_delay * 2 ** attempt))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, fn, *args, worker=None, **kwargs):
+        """Call `fn` under the rate and concurrency limits, retrying `RETRY_ERRORS`.
+
+        The last exception is re-raised once `max_retry` retries are exhausted.
+        """
+        for attempt in range(self.max_retry + 1):
+            with self.slot():
+                self.acquire(worker)
+                try:
+                    result = fn(*args, **kwargs)
+                except RETRY_ERRORS as e:
+                    self.record(False)
+                    error = e
+                else:
+                    self.record(True)
+                    return result
+            if attempt < self.max_retry:
+                time.sleep(self.backoff(attempt, blocked=isinstance(error, BlockedError)))
+        raise error
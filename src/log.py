@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FILE = os.getenv('LOG_FILE', 'logs/gm-scraper.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+REVIEW_SAMPLE_RATE = float(os.getenv('LOG_REVIEW_SAMPLE_RATE', 0.01))
+
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, with `fields` passed via `extra` nested under their own key."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if hasattr(record, 'fields'):
+            entry['fields'] = record.fields
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """Queue handler that keeps the traceback in `exc_text` instead of folding it into the message.
+
+    `fields` are copied here, on the logging thread, so later changes by the caller do not race the listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        # callers keep mutating the dicts they log, so snapshot them before the listener thread serializes
+        if hasattr(record, 'fields'):
+            record.fields = dict(record.fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class SampleFilter(logging.Filter):
+    """Keep only a fraction of the records logged with `extra={'sample': True}`."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, 'sample', False):
+            return random.random() < self.rate
+        return True
+
+
+def configure_logging(path=LOG_FILE, level=LOG_LEVEL, review_sample_rate=REVIEW_SAMPLE_RATE):
+    """Route all loggers through a queue to a single file handler.
+
+    Only the first call in a process has any effect, so scrapers and monitors
+    can call it on every instantiation without duplicating log lines.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        log_dir = os.path.dirname(path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        fh = logging.FileHandler(path)
+        fh.setFormatter(JsonFormatter())
+
+        log_queue = queue.SimpleQueue()
+        qh = StructuredQueueHandler(log_queue)
+        qh.addFilter(SampleFilter(review_sample_rate))
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(qh)
+
+        _listener = QueueListener(log_queue, fh)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(name)
@@ -5,9 +5,10 @@ import psycopg2.extras
 import os
 from dotenv import load_dotenv
 from .googlemaps import GoogleMapsScraper
+from .log import get_logger
+from .writer import ReviewWriter
 from datetime import datetime, timedelta
 import argparse
-import logging
 import sys
 
 # Load environment variables
@@ -39,7 +40,7 @@ class Monitor:
         self.min_date_review = datetime.strptime(from_date, '%Y-%m-%d')
 
         # logging
-        self.logger = self.__get_logger()
+        self.logger = get_logger('monitor')
 
     def _connect_to_db(self):
         """Connect to PostgreSQL database."""
@@ -97,9 +98,19 @@ class Monitor:
             self.logger.error(f"Error getting business info: {e}")
             return None, None
 
+    def _get_known_reviews(self, id_reviews):
+        """Get which of the given review ids are already stored."""
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT id_review FROM reviews WHERE id_review = ANY(%s)", (list(id_reviews),))
+                return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            self.logger.error(f"Error getting known reviews: {e}")
+            return None
+
     def scrape_gm_reviews(self):
-        # init scraper and incremental add reviews
-        with GoogleMapsScraper() as scraper:
+        # init scraper and incremental add reviews, persisted by a background writer
+        with GoogleMapsScraper() as scraper, ReviewWriter(DEFAULT_DB_CONFIG) as writer:
             for username in self.usernames:
                 try:
                     # Get business info from username
@@ -113,19 +124,26 @@ class Monitor:
                         stop = False
                         offset = 0
                         n_new_reviews = 0
+                        # ids stored or queued for insertion, looked up once per batch instead of per review
+                        known_reviews = set()
                         while not stop:
-                            rlist = scraper.get_reviews(offset)
+                            rlist = scraper.get_reviews_from(business_url, 1, offset)
                             if len(rlist) == 0:
                                 break
+                            stored_reviews = self._get_known_reviews(r['id_review'] for r in rlist)
+                            if stored_reviews is None:
+                                break
+                            known_reviews |= stored_reviews
                             for r in rlist:
                                 # calculate review date and compare to input min_date_review
                                 r['timestamp'] = self.__parse_relative_date(r['relative_date'])
                                 # Add business info to the review
                                 r['business_id'] = business_id
                                 r['business_username'] = username
-                                stop = self.__stop(r)
+                                stop = self.__stop(r, known_reviews)
                                 if not stop:
-                                    self._insert_review(r)
+                                    self._insert_review(writer, r)
+                                    known_reviews.add(r['id_review'])
                                     n_new_reviews += 1
                                 else:
                                     break
@@ -142,33 +160,20 @@ class Monitor:
 
                     self.logger.error('{}: {}, {}, {}'.format(username, exc_type, fname, exc_tb.tb_lineno))
 
-    def _insert_review(self, review):
-        """Insert a review into the PostgreSQL database."""
-        try:
-            with self.conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO reviews (
-                        id_review, caption, relative_date, retrieval_date, 
-                        rating, username, n_review_user, url_user, timestamp,
-                        replies, business_id, business_username
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id_review) DO NOTHING
-                """, (
-                    review.get('id_review'),
-                    review.get('caption'),
-                    review.get('relative_date'),
-                    review.get('retrieval_date'),
-                    review.get('rating'),
-                    review.get('username'),
-                    review.get('n_review_user', 0),
-                    review.get('url_user'),
-                    review.get('timestamp'),
-                    None,  # replies initially set to null
-                    review.get('business_id'),
-                    review.get('business_username')
-                ))
-        except Exception as e:
-            self.logger.error(f"Error inserting review: {e}")
+                finally:
+                    self.__log_writer_errors(writer)
+
+            # wait for pending inserts before closing the writer
+            writer.flush()
+            self.__log_writer_errors(writer)
+
+    def _insert_review(self, writer, review):
+        """Queue a review for insertion into the PostgreSQL database."""
+        writer.put(review)
+
+    def __log_writer_errors(self, writer):
+        for reviews, e in writer.pop_errors():
+            self.logger.error(f"Error inserting {len(reviews)} reviews: {e}")
 
     def __parse_relative_date(self, string_date):
         curr_date = datetime.now()
@@ -205,14 +210,12 @@ class Monitor:
             return curr_date - timedelta(seconds=1)
 
 
-    def __stop(self, r):
+    def __stop(self, r, known_reviews):
         """Check if we should stop scraping based on review date or if it already exists."""
         try:
-            with self.conn.cursor() as cursor:
-                cursor.execute("SELECT 1 FROM reviews WHERE id_review = %s", (r['id_review'],))
-                is_old_review = cursor.fetchone()
-                
-            if is_old_review is None and r['timestamp'] >= self.min_date_review:
+            is_old_review = r['id_review'] in known_reviews
+
+            if not is_old_review and r['timestamp'] >= self.min_date_review:
                 return False
             else:
                 return True
@@ -220,22 +223,6 @@ class Monitor:
             self.logger.error(f"Error checking if review exists: {e}")
             return True
 
-    def __get_logger(self):
-        # create logger
-        logger = logging.getLogger('monitor')
-        logger.setLevel(logging.DEBUG)
-        # create console handler and set level to debug
-        fh = logging.FileHandler('logs/monitor.log')
-        fh.setLevel(logging.DEBUG)
-        # create formatter
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        # add formatter to ch
-        fh.setFormatter(formatter)
-        # add ch to logger
-        logger.addHandler(fh)
-
-        return logger
-
 def main():
     parser = argparse.ArgumentParser(description='Monitor Google Maps places')
     parser.add_argument('--i', type=str, default='input/usernames.txt', help='target usernames file')
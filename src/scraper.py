@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 from .googlemaps import GoogleMapsScraper
+from .log import get_logger
 from datetime import datetime, timedelta
 import argparse
 import csv
-from termcolor import colored
 import time
 
 
@@ -37,6 +37,8 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
+    logger = get_logger('scraper')
+
     # store reviews in CSV file
     writer = csv_writer(args.source, args.sort_by)
 
@@ -57,10 +59,9 @@ if __name__ == '__main__':
 
                         while n < args.N:
 
-                            # logging to std out
-                            print(colored('[Review ' + str(n) + ']', 'cyan'), flush=True)
+                            logger.debug('[Review ' + str(n) + ']')
 
-                            reviews = scraper.get_reviews(n)
+                            reviews = scraper.get_reviews_from(url, ind[args.sort_by], n)
                             if len(reviews) == 0:
                                 break
 
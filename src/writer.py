@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+
+import psycopg2.extras
+from psycopg2.pool import ThreadedConnectionPool
+
+N_WRITERS = 2
+MAX_QUEUE = 1000
+BATCH_SIZE = 50
+_SENTINEL = object()
+
+# errors after which a connection is unusable and must be replaced
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+INSERT_REVIEWS = """
+    INSERT INTO reviews (
+        id_review, caption, relative_date, retrieval_date,
+        rating, username, n_review_user, url_user, timestamp,
+        replies, business_id, business_username
+    ) VALUES %s
+    ON CONFLICT (id_review) DO NOTHING
+"""
+
+
+class ReviewWriter:
+    """Background writer that persists reviews off the scraping thread.
+
+    Reviews are pushed into a bounded queue and inserted in batches by a
+    small pool of worker threads, each holding its own pooled connection.
+    When the queue is full, `put` blocks so the scraper cannot outrun the
+    database indefinitely.
+    """
+
+    def __init__(self, db_config, n_writers=N_WRITERS, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.pool = ThreadedConnectionPool(1, n_writers, **db_config)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.errors = queue.Queue()
+        self.workers = [threading.Thread(target=self._run, name='review-writer-{}'.format(i), daemon=True)
+                        for i in range(n_writers)]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def put(self, review):
+        """Queue a review for insertion, blocking while the queue is full."""
+        self.queue.put(review)
+
+    def flush(self):
+        """Block until every queued review has been written or failed."""
+        self.queue.join()
+
+    def pop_errors(self):
+        """Return and clear the (reviews, exception) pairs reported so far."""
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    def close(self):
+        """Drain the queue, stop the workers and release the pool."""
+        for _ in self.workers:
+            self.queue.put(_SENTINEL)
+        for worker in self.workers:
+            worker.join()
+        self.pool.closeall()
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not _SENTINEL and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = batch[-1] is _SENTINEL
+            reviews = batch[:-1] if done else batch
+            if reviews:
+                conn = self._write_batch(conn, reviews)
+            for _ in batch:
+                self.queue.task_done()
+
+            if done:
+                break
+
+        if conn is not None:
+            self.pool.putconn(conn)
+
+    def _write_batch(self, conn, reviews):
+        """Write a batch, retrying it once on a fresh connection after a connection error.
+
+        Returns the connection to keep using, or None if it had to be discarded.
+        """
+        for attempt in range(2):
+            try:
+                if conn is None:
+                    conn = self.pool.getconn()
+                    conn.autocommit = True
+                self._write_reviews(conn, reviews)
+                return conn
+            except CONNECTION_ERRORS as e:
+                if conn is not None:
+                    self.pool.putconn(conn, close=True)
+                    conn = None
+                if attempt == 1:
+                    self.errors.put((reviews, e))
+            except Exception as e:
+                self.errors.put((reviews, e))
+                return conn
+        return conn
+
+    def _write_reviews(self, conn, reviews):
+        try:
+            self._insert_reviews(conn, reviews)
+        except CONNECTION_ERRORS:
+            raise
+        except Exception:
+            # a single bad row fails the whole batch, so retry row by row and report only those
+            for review in reviews:
+                try:
+                    self._insert_reviews(conn, [review])
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    self.errors.put(([review], e))
+
+    def _insert_reviews(self, conn, reviews):
+        rows = [(
+            review.get('id_review'),
+            review.get('caption'),
+            review.get('relative_date'),
+            review.get('retrieval_date'),
+            review.get('rating'),
+            review.get('username'),
+            review.get('n_review_user', 0),
+            review.get('url_user'),
+            review.get('timestamp'),
+            None,  # replies initially set to null
+            review.get('business_id'),
+            review.get('business_username')
+        ) for review in reviews]
+
+        with conn.cursor() as cursor:
+            psycopg2.extras.execute_values(cursor, INSERT_REVIEWS, rows)
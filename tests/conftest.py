@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+import pytest
+
+# keep the scraper's log file out of the working tree
+os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'gm-scraper-tests.log'))
+
+from src.governor import Governor
+from stub_server import StubServer
+
+
+@pytest.fixture
+def stub_server():
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture
+def governor():
+    return Governor(rate=100, worker_rate=100, max_retry=2, base_delay=0.01, block_base_delay=0.02, cooldown=0)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for Google Maps that injects failures, block and CAPTCHA pages."""
+import http.client
+import threading
+import urllib.error
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+
+PLACE_PAGE = '<html><body><h1 class="DUwDvf fontHeadlineLarge">{name}</h1></body></html>'
+SORRY_PAGE = '<html><body>Our systems have detected unusual traffic from your computer network.</body></html>'
+CAPTCHA_PAGE = '<html><body><div class="g-recaptcha"></div></body></html>'
+
+
+class StubServer:
+    """Serve place pages, dropping the connection on the first `failures[path]` requests to each path.
+
+    Paths containing `blocked` redirect to a `/sorry/` page and paths containing
+    `captcha` serve a CAPTCHA page. `hits` counts requests per path.
+    """
+
+    def __init__(self):
+        self.failures = Counter()
+        self.hits = Counter()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = 'http://127.0.0.1:{}/maps/'.format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                server.hits[path] += 1
+
+                if server.failures[path] > 0:
+                    server.failures[path] -= 1
+                    # close without a response, which a browser reports as a navigation error
+                    self.close_connection = True
+                    return
+
+                if path.startswith('/sorry/'):
+                    self._send(SORRY_PAGE, status=429)
+                elif 'blocked' in path:
+                    self.send_response(302)
+                    self.send_header('Location', '/sorry/index?continue=' + path)
+                    self.end_headers()
+                elif 'captcha' in path:
+                    self._send(CAPTCHA_PAGE)
+                else:
+                    self._send(PLACE_PAGE.format(name=path.split('/')[3]))
+
+            def _send(self, body, status=200):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class UrllibDriver:
+    """Minimal WebDriver stand-in that loads pages over plain HTTP, following redirects like a browser."""
+
+    def __init__(self):
+        self.current_url = None
+        self.page_source = ''
+
+    def get(self, url):
+        try:
+            with urllib.request.urlopen(url, timeout=5) as resp:
+                self.current_url = resp.geturl()
+                self.page_source = resp.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            # browsers render error pages instead of failing the navigation
+            self.current_url = e.geturl()
+            self.page_source = e.read().decode('utf-8')
+        except (urllib.error.URLError, http.client.HTTPException, ConnectionError) as e:
+            raise WebDriverException(f'net::ERR_EMPTY_RESPONSE: {e}')
+
+    def find_element(self, by, value):
+        raise NoSuchElementException(value)
+
+    def find_elements(self, by, value):
+        return []
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import pytest
+from selenium.webdriver.support.ui import WebDriverWait
+
+from src.googlemaps import MIN_ZOOM, GoogleMapsScraper
+from src.governor import BlockedError, NavigationError
+from stub_server import UrllibDriver
+
+
+@pytest.fixture
+def scraper(stub_server, governor):
+    driver = UrllibDriver()
+    scraper = GoogleMapsScraper(governor=governor, base_url=stub_server.base_url, driver=driver)
+    # the stub never serves a cookie banner, so don't wait for one
+    scraper.wait = WebDriverWait(driver, 0.1)
+    return scraper
+
+
+def test_get_account_retries_dropped_connections(stub_server, scraper):
+    stub_server.failures['/maps/place/Flaky/@1.5,2.5,15z'] = 2
+
+    place = scraper.get_account(stub_server.base_url + 'place/Flaky/@1.5,2.5,15z')
+
+    assert place['name'] == 'Flaky'
+    assert place['lat'] == '1.5'
+    assert stub_server.hits['/maps/place/Flaky/@1.5,2.5,15z'] == 3
+
+
+def test_get_account_detects_sorry_page(stub_server, scraper):
+    with pytest.raises(BlockedError):
+        scraper.get_account(stub_server.base_url + 'place/blocked/@1,2,15z')
+
+    assert stub_server.hits['/maps/place/blocked/@1,2,15z'] == scraper.governor.max_retry + 1
+
+
+def test_sort_by_gives_up_on_captcha(stub_server, scraper):
+    assert scraper.sort_by(stub_server.base_url + 'place/captcha/@1,2,15z', 1) == -1
+    assert stub_server.hits['/maps/place/captcha/@1,2,15z'] == scraper.governor.max_retry + 1
+
+
+def test_search_point_url_uses_base_url(stub_server, scraper):
+    url = scraper._search_point_url('coffee', 1.0, 2.0, 13)
+
+    assert url == stub_server.base_url + 'search/coffee/@1.000000,2.000000,13z'
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    (tmp_path / 'input').mkdir()
+    (tmp_path / 'output').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def write_square_points(workdir, points):
+    lines = ['city,latitude,longitude'] + [f'{city},{lat},{lng}' for city, lat, lng in points]
+    (workdir / 'input' / 'square_points.csv').write_text('\n'.join(lines) + '\n')
+
+
+def test_single_point_gets_one_cell_centered_on_it(workdir, scraper):
+    write_square_points(workdir, [('A', 40.0, -3.0)])
+
+    cells = scraper._gen_search_cells(keyword_list=['coffee'])
+
+    assert len(cells) == 1
+    keyword, lat, lng, zoom = cells[0]
+    assert (keyword, zoom) == ('coffee', MIN_ZOOM)
+    assert lat == pytest.approx(40.0)
+    assert lng == pytest.approx(-3.0)
+
+
+def test_grid_is_centered_on_bounding_box(workdir, scraper):
+    span = scraper._cell_span(MIN_ZOOM)
+    write_square_points(workdir, [('A', 40.0, -3.0), ('A', 40.0 + 1.5 * span, -3.0 + 0.5 * span)])
+
+    cells = scraper._gen_search_cells(keyword_list=['coffee'])
+
+    lats = sorted({lat for _, lat, _, _ in cells})
+    lngs = sorted({lng for _, _, lng, _ in cells})
+    assert len(lats) == 2 and len(lngs) == 1
+    assert sum(lats) / 2 == pytest.approx(40.0 + 0.75 * span)
+    assert lats[1] - lats[0] == pytest.approx(span)
+    assert lngs[0] == pytest.approx(-3.0 + 0.25 * span)
+
+
+def test_split_cell_covers_parent_quadrants(scraper):
+    quarter = scraper._cell_span(MIN_ZOOM) / 4
+
+    children = scraper._split_cell('coffee', 40.0, -3.0, MIN_ZOOM)
+
+    assert {zoom for _, _, _, zoom in children} == {MIN_ZOOM + 1}
+    assert sorted((round(lat - 40.0, 9), round(lng + 3.0, 9)) for _, lat, lng, _ in children) == sorted(
+        (round(d_lat, 9), round(d_lng, 9)) for d_lat in (-quarter, quarter) for d_lng in (-quarter, quarter))
+
+
+def test_get_places_splits_only_saturated_cells_with_new_places(workdir, scraper, monkeypatch):
+    root = ('coffee', 40.0, -3.0, MIN_ZOOM)
+    monkeypatch.setattr(scraper, '_gen_search_cells', lambda keyword_list=None: [root, root])
+    loaded = []
+
+    def scrape_search_point(url):
+        loaded.append(url)
+        zoom = int(url.rsplit(',', 1)[1][:-1])
+        if zoom == MIN_ZOOM:
+            # saturated both times, but the duplicate root yields nothing new the second time
+            return [{'search_point_url': url, 'href': f'/place/{i}', 'name': str(i)} for i in range(3)], True
+        return [{'search_point_url': url, 'href': f'/place/{url}', 'name': url}], False
+
+    monkeypatch.setattr(scraper, '_scrape_search_point', scrape_search_point)
+
+    scraper.get_places(keyword_list=['coffee'])
+
+    assert len(loaded) == 2 + 4
+    assert all(url.endswith(f',{MIN_ZOOM + 1}z') for url in loaded[2:])
+    assert len((workdir / 'output' / 'places_wax.csv').read_text().splitlines()) == 1 + 3 + 4
+
+
+def test_get_places_requeues_failed_cell_once(workdir, scraper, monkeypatch):
+    monkeypatch.setattr(scraper, '_gen_search_cells', lambda keyword_list=None: [('coffee', 40.0, -3.0, MIN_ZOOM)])
+    loaded = []
+
+    def scrape_search_point(url):
+        loaded.append(url)
+        raise NavigationError('net::ERR_CONNECTION_RESET')
+
+    monkeypatch.setattr(scraper, '_scrape_search_point', scrape_search_point)
+
+    scraper.get_places(keyword_list=['coffee'])
+
+    assert len(loaded) == 2 * (scraper.governor.max_retry + 1)
+
+
+def test_search_point_without_results_list_is_not_a_failure(stub_server, scraper):
+    url = stub_server.base_url + 'search/coffee/@1,2,15z'
+
+    assert scraper.governor.run(scraper._scrape_search_point, url) == ([], False)
+    assert stub_server.hits['/maps/search/coffee/@1,2,15z'] == 1
+    assert list(scraper.governor.outcomes) == [True]
+
+
+def test_sort_by_without_sort_button_is_not_retried(stub_server, scraper):
+    assert scraper.sort_by(stub_server.base_url + 'place/NoReviews/@1,2,15z', 1) == -1
+    assert stub_server.hits['/maps/place/NoReviews/@1,2,15z'] == 1
+    assert False not in scraper.governor.outcomes
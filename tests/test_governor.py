@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import http.client
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.governor import BlockedError, Governor, NavigationError, is_block_page
+
+
+def fetch(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.read().decode('utf-8')
+    except (urllib.error.URLError, http.client.HTTPException, ConnectionError) as e:
+        raise NavigationError(str(e)) from e
+
+
+def test_run_retries_injected_failures(stub_server, governor):
+    stub_server.failures['/maps/place/Flaky/@1,2,15z'] = 2
+
+    page = governor.run(fetch, stub_server.base_url + 'place/Flaky/@1,2,15z')
+
+    assert 'Flaky' in page
+    assert stub_server.hits['/maps/place/Flaky/@1,2,15z'] == 3
+
+
+def test_run_raises_after_max_retry(stub_server, governor):
+    stub_server.failures['/maps/place/Down/@1,2,15z'] = 10
+
+    with pytest.raises(NavigationError):
+        governor.run(fetch, stub_server.base_url + 'place/Down/@1,2,15z')
+
+    assert stub_server.hits['/maps/place/Down/@1,2,15z'] == governor.max_retry + 1
+
+
+def test_run_does_not_retry_or_record_other_errors(governor):
+    calls = []
+
+    def missing_element():
+        calls.append(1)
+        raise LookupError('no Sort button')
+
+    with pytest.raises(LookupError):
+        governor.run(missing_element)
+
+    assert len(calls) == 1
+    assert list(governor.outcomes) == []
+
+
+def test_negative_max_retry_rejected():
+    with pytest.raises(ValueError):
+        Governor(max_retry=-1)
+
+
+def test_error_rate_lowers_concurrency_and_rates():
+    governor = Governor(rate=10, worker_rate=5, max_concurrency=4, window=4, max_error_rate=0.3, cooldown=0.2)
+    governor.acquire(worker='w')
+
+    for _ in range(4):
+        governor.record(False)
+
+    assert governor.limit == 2
+    assert governor.bucket.rate == 5
+    assert governor.worker_buckets['w'].rate == 2.5
+    assert governor.cooldown_until > time.monotonic()
+
+    for _ in range(4):
+        governor.record(True)
+
+    assert governor.limit == 3
+    assert governor.bucket.rate == 10
+    assert governor.worker_buckets['w'].rate == 5
+
+
+def test_cooldown_pauses_acquire():
+    governor = Governor(rate=100, worker_rate=100, window=2, cooldown=0.3)
+    governor.record(False)
+    governor.record(False)
+
+    start = time.monotonic()
+    governor.acquire()
+
+    assert time.monotonic() - start >= 0.25
+
+
+def test_blocked_backoff_is_longer():
+    governor = Governor(base_delay=0.01, max_delay=0.01, block_base_delay=10, block_max_delay=10)
+
+    assert all(governor.backoff(3) <= 0.01 for _ in range(20))
+    assert max(governor.backoff(0, blocked=True) for _ in range(20)) > 0.01
+
+
+def test_is_block_page():
+    assert is_block_page('https://www.google.com/sorry/index?continue=x', '')
+    assert is_block_page('https://www.google.com/maps/', '<div class="g-recaptcha"></div>')
+    assert is_block_page('https://www.google.com/maps/', 'Our systems have detected unusual traffic')
+    assert not is_block_page('https://www.google.com/maps/place/x', '<html>reviews</html>')
+    assert not is_block_page(None, None)
+
+
+def test_run_gives_up_when_always_blocked(governor):
+    calls = []
+
+    def blocked():
+        calls.append(time.monotonic())
+        raise BlockedError('sorry')
+
+    with pytest.raises(BlockedError):
+        governor.run(blocked)
+
+    assert len(calls) == governor.max_retry + 1
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import psycopg2
+import psycopg2.extras
+import pytest
+from psycopg2.pool import PoolError
+
+from src import writer as writer_module
+from src.writer import ReviewWriter
+
+
+class FakeDatabase:
+    """Stores inserted review ids, failing connections or rows on demand."""
+
+    def __init__(self):
+        self.rows = []
+        self.bad_ids = set()
+        self.outages = 0
+        self.lock = threading.Lock()
+
+    def insert(self, rows):
+        with self.lock:
+            if self.outages > 0:
+                self.outages -= 1
+                raise psycopg2.OperationalError('server closed the connection unexpectedly')
+            if any(row[0] in self.bad_ids for row in rows):
+                raise psycopg2.DataError('invalid byte sequence')
+            self.rows += [row[0] for row in rows]
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+class FakeConnection:
+
+    def __init__(self, db):
+        self.db = db
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakePool:
+
+    def __init__(self, db, fail_getconn=False):
+        self.db = db
+        self.fail_getconn = fail_getconn
+        self.closed = []
+        self.returned = []
+
+    def getconn(self):
+        if self.fail_getconn:
+            raise PoolError('connection pool exhausted')
+        return FakeConnection(self.db)
+
+    def putconn(self, conn, close=False):
+        (self.closed if close else self.returned).append(conn)
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(psycopg2.extras, 'execute_values', lambda cursor, sql, rows: cursor.connection.db.insert(rows))
+    return db
+
+
+def make_writer(monkeypatch, pool, **kwargs):
+    monkeypatch.setattr(writer_module, 'ThreadedConnectionPool', lambda minconn, maxconn, **config: pool)
+    return ReviewWriter({}, **kwargs)
+
+
+def reviews(n):
+    return [{'id_review': str(i)} for i in range(n)]
+
+
+def test_close_drains_queue(monkeypatch, db):
+    pool = FakePool(db)
+    with make_writer(monkeypatch, pool, n_writers=2, batch_size=7) as writer:
+        for review in reviews(100):
+            writer.put(review)
+
+    assert sorted(db.rows, key=int) == [str(i) for i in range(100)]
+    assert writer.pop_errors() == []
+    assert pool.closed == []
+
+
+def test_bad_row_only_fails_itself(monkeypatch, db):
+    db.bad_ids = {'3'}
+    with make_writer(monkeypatch, FakePool(db), n_writers=1, batch_size=10) as writer:
+        for review in reviews(10):
+            writer.put(review)
+        writer.flush()
+        errors = writer.pop_errors()
+
+    assert sorted(db.rows, key=int) == [str(i) for i in range(10) if i != 3]
+    assert [[r['id_review'] for r in failed] for failed, e in errors] == [['3']]
+
+
+def test_broken_connection_is_replaced_and_batch_retried(monkeypatch, db):
+    db.outages = 1
+    pool = FakePool(db)
+    with make_writer(monkeypatch, pool, n_writers=1, batch_size=5) as writer:
+        for review in reviews(5):
+            writer.put(review)
+        writer.flush()
+        errors = writer.pop_errors()
+
+    assert errors == []
+    assert sorted(db.rows, key=int) == [str(i) for i in range(5)]
+    assert len(pool.closed) == 1
+    assert pool.returned and pool.returned[0] is not pool.closed[0]
+
+
+def test_batch_reported_when_retry_also_fails(monkeypatch, db):
+    db.outages = 2
+    with make_writer(monkeypatch, FakePool(db), n_writers=1, batch_size=5) as writer:
+        for review in reviews(5):
+            writer.put(review)
+        writer.flush()
+        errors = writer.pop_errors()
+
+    assert len(errors) == 1
+    assert isinstance(errors[0][1], psycopg2.OperationalError)
+    assert len(errors[0][0]) == 5
+
+
+def test_getconn_failure_is_reported_and_queue_keeps_draining(monkeypatch, db):
+    pool = FakePool(db, fail_getconn=True)
+    writer = make_writer(monkeypatch, pool, n_writers=1, max_queue=2, batch_size=1)
+
+    # more reviews than the queue holds, so put() would block forever if the worker had died
+    for review in reviews(10):
+        writer.put(review)
+    writer.close()
+
+    errors = writer.pop_errors()
+    assert len(errors) == 10
+    assert all(isinstance(e, PoolError) for failed, e in errors)